@@ -1,36 +1,45 @@
 import streamlit as st
-import tempfile, os
+import tempfile, os, io
 import soundfile as sf
 import pyttsx3
 from langdetect import detect
 from moviepy.editor import VideoFileClip
-from faster_whisper import WhisperModel
 
 from auth.auth_db import create_users_table, signup_user, login_user
-from vectorstore.faiss_store import FAISSStore
-from embeddings.text_embedder import embed_text
+from vectorstore.user_stores import (
+    get_user_store, reset_user_store, set_user_store, drop_user_store
+)
+from embeddings.text_embedder import embed_texts
+from embeddings.audio_embedder import transcribe
+from embeddings.inference_service import InferenceService, ServiceBusy
 
 from ingestion.ingest_text import ingest_uploaded_text
 from ingestion.ingest_image import ingest_uploaded_image
+from embeddings.image_embedder import embed_image
 from ingestion.ingest_audio import ingest_uploaded_audio
 from ingestion.ingest_excel import ingest_uploaded_excel
 
 from retrieval.intent_classifier import classify_intent
-from retrieval.confidence import confidence_score
+from retrieval.confidence import MIN_CONFIDENCE, uncertainty_message
+from retrieval.retriever import retrieve
+from retrieval.conflict import analyze_evidence, contradiction_scores
 from rag.generator import generate_answer
+from utils.export import chat_to_text
+from utils.archive import export_archive, import_archive
 
 
 # ===================== LOAD MODELS =====================
+# One service per process: batches embeddings across all sessions
 @st.cache_resource
-def load_whisper():
-    return WhisperModel("base", device="cpu")
+def load_inference_service():
+    return InferenceService(embed_texts, transcribe)
 
-whisper = load_whisper()
+service = load_inference_service()
 
 
 # ===================== VIDEO INGEST =====================
-def ingest_uploaded_video(file):
-    vectors, metas = [], []
+def ingest_uploaded_video(file, user):
+    texts, metas = [], []
 
     tmp_dir = tempfile.mkdtemp()   # ⬅ manual temp dir (important)
     video_path = os.path.join(tmp_dir, file.name)
@@ -45,7 +54,7 @@ def ingest_uploaded_video(file):
         audio_path = os.path.join(tmp_dir, "audio.wav")
         clip.audio.write_audiofile(audio_path, logger=None)
 
-        segments, _ = whisper.transcribe(audio_path)
+        segments = service.transcribe(user, audio_path)
 
         speaker = 1
         last_end = 0
@@ -58,7 +67,7 @@ def ingest_uploaded_video(file):
             if not text:
                 continue
 
-            vectors.append(embed_text(text))
+            texts.append(text)
             metas.append({
                 "content": text,
                 "source": file.name,
@@ -84,7 +93,7 @@ def ingest_uploaded_video(file):
         except:
             pass
 
-    return vectors, metas
+    return service.embed(user, texts), metas
 
 
 # ===================== TEXT TO SPEECH =====================
@@ -153,7 +162,12 @@ if not st.session_state.authenticated:
 
 # ===================== LOGOUT =====================
 st.sidebar.write(f"👤 {st.session_state.username}")
-if st.sidebar.button("Logout"):
+if st.sidebar.button(
+    "Logout",
+    help="Also clears this account's indexed files in every open tab. "
+         "Use Export Workspace first to keep them."
+):
+    drop_user_store(st.session_state.username)
     st.session_state.clear()
     st.rerun()
 
@@ -165,9 +179,16 @@ if "chat_sessions" not in st.session_state:
     }
     st.session_state.current_chat = "Chat 1"
 
-if "store" not in st.session_state:
-    st.session_state.store = FAISSStore()
-    st.session_state.ingested = False
+username = st.session_state.username
+store = get_user_store(username)
+
+
+def embed_batch(texts):
+    return service.embed(username, texts)
+
+
+def embed_one(text):
+    return service.embed_one(username, text)
 
 
 # ===================== SIDEBAR CHAT CONTROL =====================
@@ -200,17 +221,49 @@ if st.sidebar.button("🗑 Delete Chat"):
 
 if st.sidebar.button("⬇️ Export Chat"):
     chat = st.session_state.chat_sessions[st.session_state.current_chat]
-    content = f"Summary:\n{chat['summary']}\n\n"
-    for q, a in chat["messages"]:
-        content += f"Q: {q}\nA: {a}\n\n"
 
     st.sidebar.download_button(
         "Download",
-        content,
+        chat_to_text(chat),
         file_name=f"{st.session_state.current_chat}.txt"
     )
 
 
+# ===================== BACKUP / MIGRATION =====================
+st.sidebar.subheader("📦 Workspace")
+
+if st.sidebar.button("Export Workspace"):
+    buf = io.BytesIO()
+    export_archive(buf, store, st.session_state.chat_sessions, username)
+
+    st.sidebar.download_button(
+        "Download Archive",
+        buf.getvalue(),
+        file_name=f"{username}_workspace.zip",
+        mime="application/zip"
+    )
+
+archive = st.sidebar.file_uploader("Import Workspace", type=["zip"])
+if archive and st.sidebar.button("Import"):
+    try:
+        imported, chats, _ = import_archive(archive, dim=store.dim)
+    except ValueError as e:
+        st.sidebar.error(f"Import failed: {e}")
+    else:
+        if imported is not None:
+            store = set_user_store(username, imported)
+        if chats:
+            st.session_state.chat_sessions = chats
+            st.session_state.current_chat = list(chats)[0]
+        st.rerun()
+
+
+use_nli = st.sidebar.checkbox(
+    "🧪 Check evidence for contradictions",
+    help="Runs an NLI model over the most similar evidence pairs"
+)
+
+
 # ===================== MAIN UI =====================
 st.title("🧠 Multimodal RAG System")
 st.caption("ChatGPT-style Multimodal Assistant with History, Video & Voice Output")
@@ -227,34 +280,45 @@ files = st.file_uploader(
     accept_multiple_files=True
 )
 
+parent_child = st.checkbox(
+    "Small-to-embed, large-to-return text chunks",
+    help="Embeds short passages but answers from their surrounding section"
+)
+
 if st.button("📥 Ingest Files"):
-    st.session_state.store = FAISSStore()
     embeddings, metas = [], []
 
-    with st.spinner("Indexing files..."):
-        for f in files:
-            ext = f.name.split(".")[-1].lower()
-
-            if ext in ["pdf","txt","docx"]:
-                e,m = ingest_uploaded_text(f)
-            elif ext in ["png","jpg","jpeg"]:
-                e,m = ingest_uploaded_image(f)
-            elif ext in ["mp3","wav"]:
-                e,m = ingest_uploaded_audio(f)
-            elif ext in ["xls","xlsx"]:
-                e,m = ingest_uploaded_excel(f)
-            elif ext in ["mp4","mkv","avi"]:
-                e,m = ingest_uploaded_video(f)
-            else:
-                continue
-
-            embeddings.extend(e)
-            metas.extend(m)
-
-        st.session_state.store.add(embeddings, metas)
-        st.session_state.ingested = True
-
-    st.success("Files indexed successfully")
+    try:
+        with st.spinner("Indexing files..."):
+            for f in files:
+                ext = f.name.split(".")[-1].lower()
+
+                if ext in ["pdf","txt","docx"]:
+                    e,m = ingest_uploaded_text(f, parent_child, embed_batch)
+                elif ext in ["png","jpg","jpeg"]:
+                    e,m = ingest_uploaded_image(
+                        f, lambda p: service.run(username, embed_image, p)
+                    )
+                elif ext in ["mp3","wav"]:
+                    e,m = ingest_uploaded_audio(
+                        f, lambda p: service.transcribe(username, p), embed_one
+                    )
+                elif ext in ["xls","xlsx"]:
+                    e,m = ingest_uploaded_excel(f, embed_fn=embed_batch)
+                elif ext in ["mp4","mkv","avi"]:
+                    e,m = ingest_uploaded_video(f, username)
+                else:
+                    continue
+
+                embeddings.extend(e)
+                metas.extend(m)
+
+            store = reset_user_store(username)
+            store.add(embeddings, metas)
+
+        st.success("Files indexed successfully")
+    except ServiceBusy:
+        st.error("Server is busy, please retry in a moment")
 
 
 # ===================== CHAT DISPLAY =====================
@@ -277,20 +341,56 @@ if query:
     with st.chat_message("user"):
         st.write(query)
 
-    if not st.session_state.ingested:
+    if store.index.ntotal == 0:
         answer = "Please ingest files first."
     else:
-        q_emb = embed_text(query)
-        results = st.session_state.store.search(q_emb, k=6)
-
-        if not results:
+        intent = classify_intent(query)
+        try:
+            q_emb = embed_one(query)
+            results, vectors, conf = retrieve(store, q_emb, intent)
+        except ServiceBusy:
+            results = None
+
+        if results is None:
+            answer = "Server is busy, please retry in a moment."
+        elif not results:
             answer = "No relevant evidence found."
+        elif conf < MIN_CONFIDENCE:
+            # Not worth an LLM call
+            answer = "Insufficient evidence in the uploaded files to answer this."
         else:
-            evidence = [r[0] for r in results]
-            conf = confidence_score(results, classify_intent(query))
+            metas = [r[0] for r in results]
+            try:
+                report = analyze_evidence(
+                    metas, vectors, nli=use_nli,
+                    nli_fn=lambda pairs: service.run(username, contradiction_scores, pairs)
+                )
+            except Exception:
+                # NLI is optional (busy, offline, model missing, OOM):
+                # fall back to the embedding-only pass
+                report = analyze_evidence(metas, vectors)
+
+            # Near-duplicates and parent-child chunks sharing a parent
+            # are sent to the LLM once
+            evidence = list({
+                metas[i]["content"]: metas[i] for i in report["unique"]
+            }.values())
             answer = generate_answer(query, evidence)
             answer += f"\n\nConfidence: {int(conf*100)}%"
 
+            warning = uncertainty_message(conf)
+            if warning:
+                answer += f"\n\n{warning}"
+
+            if use_nli and report["conflicts"]:
+                answer += "\n\n⚠️ Some sources appear to contradict each other:"
+                for i, j, _ in report["conflicts"]:
+                    answer += f"\n- {metas[i]['source']} vs {metas[j]['source']}"
+
+            answer += "\n\nSources: " + ", ".join(
+                f"{doc} ({pct}%)" for doc, pct in report["coverage"].items()
+            )
+
     with st.chat_message("assistant"):
         st.write(answer)
         audio, sr_ = text_to_speech(answer)
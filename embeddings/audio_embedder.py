@@ -4,9 +4,17 @@ from embeddings.text_embedder import embed_text
 model = WhisperModel("base", device="cpu", compute_type="int8")
 
 
-def embed_audio(path):
+def transcribe(path):
+    """
+    Returns the list of Whisper segments for an audio/video file
+    (faster-whisper yields lazily, so the decode happens here)
+    """
     segments, _ = model.transcribe(path)
-    text = " ".join(seg.text for seg in segments)
+    return list(segments)
 
-    embedding = embed_text(text)  # 🔥 reuses fixed text embedder
+
+def embed_audio(path, transcribe_fn=transcribe, embed_fn=embed_text):
+    text = " ".join(seg.text for seg in transcribe_fn(path))
+
+    embedding = embed_fn(text)  # 🔥 reuses fixed text embedder
     return embedding, text
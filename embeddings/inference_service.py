@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class ServiceBusy(RuntimeError):
+    """Raised when a request is not admitted or not served in time"""
+
+
+class _Job:
+    def __init__(self, texts):
+        self.texts = texts
+        self.results = [None] * len(texts)
+        self.remaining = len(texts)
+        self.error = None
+        self.done = threading.Event()
+
+
+class InferenceService:
+    """
+    In-process inference server shared by every Streamlit session.
+
+    Embedding requests from all users are queued per user and a single
+    dispatcher builds batches round-robin across users, so one large
+    ingest cannot starve another user's query. Other models (Whisper,
+    CLIP, the NLI cross-encoder) run through `run` on a small shared
+    pool. Each user may have at most `max_calls_per_user` calls in
+    flight and the service at most `max_calls`; extra calls wait up to
+    `admission_timeout` seconds and then raise ServiceBusy, as does a
+    call not served within `request_timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        embed_fn,
+        transcribe_fn=None,
+        max_batch=64,
+        max_wait=0.01,
+        model_workers=2,
+        max_calls=64,
+        max_calls_per_user=4,
+        admission_timeout=30.0,
+        request_timeout=300.0
+    ):
+        self.embed_fn = embed_fn
+        self.transcribe_fn = transcribe_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_calls = max_calls
+        self.max_calls_per_user = max_calls_per_user
+        self.admission_timeout = admission_timeout
+        self.request_timeout = request_timeout
+
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()    # user -> deque[(job, index)]
+        self._calls = {}                # user -> calls in flight
+        self._total_calls = 0
+
+        self._models = ThreadPoolExecutor(
+            max_workers=model_workers,
+            thread_name_prefix="model"
+        )
+        self._dispatcher = threading.Thread(
+            target=self._run, name="embed-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    # ---------------- admission ----------------
+    def _admit(self, user):
+        deadline = time.monotonic() + self.admission_timeout
+        with self._cond:
+            while (
+                self._total_calls >= self.max_calls
+                or self._calls.get(user, 0) >= self.max_calls_per_user
+            ):
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise ServiceBusy(f"Inference service busy for user {user!r}")
+                self._cond.wait(left)
+            self._calls[user] = self._calls.get(user, 0) + 1
+            self._total_calls += 1
+
+    def _release(self, user):
+        with self._cond:
+            self._calls[user] -= 1
+            if not self._calls[user]:
+                del self._calls[user]
+            self._total_calls -= 1
+            self._cond.notify_all()
+
+    # ---------------- public API ----------------
+    def embed(self, user, texts):
+        """
+        Embeds a list of texts for user, returns one vector per text
+        """
+        if not texts:
+            return []
+
+        self._admit(user)
+        try:
+            # Feed the queue one batch at a time so a large ingest keeps
+            # at most max_batch items per call waiting on the dispatcher
+            results = []
+            for start in range(0, len(texts), self.max_batch):
+                job = _Job(texts[start:start + self.max_batch])
+                with self._cond:
+                    q = self._queues.setdefault(user, deque())
+                    q.extend((job, i) for i in range(len(job.texts)))
+                    self._cond.notify_all()
+                if not job.done.wait(self.request_timeout):
+                    # Mark it done so the dispatcher skips what is left
+                    with self._cond:
+                        if not job.done.is_set():
+                            job.error = ServiceBusy("Embedding request timed out")
+                            job.done.set()
+                if job.error:
+                    raise job.error
+                results.extend(job.results)
+            return results
+        finally:
+            self._release(user)
+
+    def embed_one(self, user, text):
+        return self.embed(user, [text])[0]
+
+    def run(self, user, fn, *args):
+        """
+        Runs fn(*args) on the shared model pool under admission control
+        """
+        self._admit(user)
+        try:
+            future = self._models.submit(fn, *args)
+            try:
+                return future.result(self.request_timeout)
+            except FutureTimeout:
+                future.cancel()
+                raise ServiceBusy("Model request timed out")
+        finally:
+            self._release(user)
+
+    def transcribe(self, user, path):
+        """
+        Runs Whisper on the shared model pool
+        """
+        if self.transcribe_fn is None:
+            raise ValueError("No transcription model configured")
+
+        return self.run(user, self.transcribe_fn, path)
+
+    # ---------------- dispatcher ----------------
+    def _next_batch(self):
+        """
+        Takes up to max_batch items, one per user in turn
+        """
+        batch = []
+        while self._queues and len(batch) < self.max_batch:
+            for user in list(self._queues):
+                q = self._queues[user]
+                # Skip leftovers of jobs that already failed or timed out
+                while q and q[0][0].done.is_set():
+                    q.popleft()
+                if q:
+                    batch.append(q.popleft())
+                if not q:
+                    del self._queues[user]
+                if len(batch) >= self.max_batch:
+                    break
+            # Rotate so the next batch starts with a different user
+            if self._queues:
+                self._queues.move_to_end(next(iter(self._queues)))
+        return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                with self._cond:
+                    while not self._queues:
+                        self._cond.wait()
+                    # Short linger lets concurrent sessions join the batch
+                    self._cond.wait(self.max_wait)
+                    batch = self._next_batch()
+
+                if not batch:
+                    continue
+
+                vectors = self.embed_fn([job.texts[i] for job, i in batch])
+                if vectors is None or len(vectors) != len(batch):
+                    raise RuntimeError(
+                        f"embed_fn returned {0 if vectors is None else len(vectors)} "
+                        f"vectors for {len(batch)} texts"
+                    )
+
+                for (job, i), vec in zip(batch, vectors):
+                    job.results[i] = vec
+                    job.remaining -= 1
+                    if not job.remaining:
+                        job.done.set()
+
+            except Exception as e:
+                # Never let the dispatcher die, fail the affected callers
+                for job, _ in batch:
+                    if not job.done.is_set():
+                        job.error = e
+                        job.done.set()
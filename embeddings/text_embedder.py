@@ -1,3 +1,5 @@
+import copy
+import threading
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
@@ -24,3 +26,51 @@ def embed_text(text: str):
         raise ValueError(f"Text embedding is not 1D: shape={emb.shape}")
 
     return emb.astype("float32").tolist()
+
+
+# Max tokens the model attends to (longer inputs are silently truncated)
+MAX_TOKENS = model.max_seq_length
+
+# Chunking counts tokens from script threads while the inference
+# service encodes on model.tokenizer; HF fast tokenizers are not safe
+# to share ("Already borrowed"), so counting uses its own copy + lock
+_count_tokenizer = copy.deepcopy(model.tokenizer)
+_count_lock = threading.Lock()
+
+
+def count_tokens(text: str):
+    """
+    Returns the number of wordpiece tokens for text,
+    excluding the [CLS]/[SEP] special tokens
+    """
+
+    if not text:
+        return 0
+
+    with _count_lock:
+        ids = _count_tokenizer(text, add_special_tokens=False)["input_ids"]
+    return len(ids)
+
+
+def embed_texts(texts, batch_size=64):
+    """
+    Batch version of embed_text, returns one 384-dim embedding per text
+    """
+
+    out = [np.zeros(384, dtype="float32").tolist() for _ in texts]
+    idx = [i for i, t in enumerate(texts) if t and t.strip()]
+
+    if not idx:
+        return out
+
+    embs = model.encode(
+        [texts[i] for i in idx],
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        convert_to_numpy=True
+    )
+
+    for i, emb in zip(idx, embs.astype("float32")):
+        out[i] = emb.tolist()
+
+    return out
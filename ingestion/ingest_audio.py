@@ -1,12 +1,17 @@
 import tempfile
-from embeddings.audio_embedder import embed_audio
+from embeddings.audio_embedder import embed_audio, transcribe
+from embeddings.text_embedder import embed_text
 
-def ingest_uploaded_audio(file):
+def ingest_uploaded_audio(file, transcribe_fn=transcribe, embed_fn=embed_text):
     with tempfile.NamedTemporaryFile(delete=False, suffix=file.name) as tmp:
         tmp.write(file.read())
         path = tmp.name
 
-    emb, text = embed_audio(path)
+    emb, text = embed_audio(path, transcribe_fn, embed_fn)
+
+    # Silence / blank transcript: nothing worth indexing
+    if not text.strip():
+        return [], []
 
     return [emb], [{
         "content": text,
@@ -1,14 +1,13 @@
 import pandas as pd
-from embeddings.text_embedder import embed_text
+from embeddings.text_embedder import embed_texts
 
 
-def ingest_uploaded_excel(file, chunk_size=10):
+def ingest_uploaded_excel(file, chunk_size=10, embed_fn=embed_texts):
     """
     Ingests Excel files (.xls, .xlsx)
-    Converts rows into text chunks and embeds them
+    Converts rows into text chunks and embeds them in one batch
     """
 
-    embeddings = []
     metadatas = []
 
     xls = pd.ExcelFile(file)
@@ -39,9 +38,6 @@ def ingest_uploaded_excel(file, chunk_size=10):
             chunk_rows = rows_as_text[i : i + chunk_size]
             chunk_text = "\n".join(chunk_rows)
 
-            emb = embed_text(chunk_text)
-
-            embeddings.append(emb)
             metadatas.append({
                 "source": file.name,
                 "sheet": sheet_name,
@@ -50,4 +46,6 @@ def ingest_uploaded_excel(file, chunk_size=10):
                 "modality": "excel"
             })
 
+    embeddings = embed_fn([m["content"] for m in metadatas])
+
     return embeddings, metadatas
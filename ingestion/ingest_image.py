@@ -2,12 +2,12 @@ import tempfile
 from embeddings.image_embedder import embed_image
 from utils.ocr import extract_text_from_image
 
-def ingest_uploaded_image(file):
+def ingest_uploaded_image(file, embed_fn=embed_image):
     with tempfile.NamedTemporaryFile(delete=False, suffix=file.name) as tmp:
         tmp.write(file.read())
         path = tmp.name
 
-    emb = embed_image(path)
+    emb = embed_fn(path)
     text = extract_text_from_image(path) or "Image content"
 
     return [emb], [{
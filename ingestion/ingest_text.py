@@ -1,20 +1,189 @@
+import re
 from PyPDF2 import PdfReader
 from docx import Document
-from embeddings.text_embedder import embed_text
+from embeddings.text_embedder import embed_texts, count_tokens, MAX_TOKENS
 
-CHUNK_SIZE = 800
-OVERLAP = 200
+# Token budgets (MiniLM window minus [CLS]/[SEP])
+CHUNK_TOKENS = MAX_TOKENS - 2
+OVERLAP_SENTENCES = 1
 
-def chunk_text(text):
-    chunks = []
-    start = 0
-    while start < len(text):
-        chunks.append(text[start:start + CHUNK_SIZE])
-        start += CHUNK_SIZE - OVERLAP
-    return chunks
+# Parent-child mode: small chunks are embedded, large parents are returned
+CHILD_TOKENS = 128
+PARENT_TOKENS = 1024
 
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_HEADING_RE = re.compile(r"^(#+\s|\d{1,2}(\.\d{1,2})*\.?\s+[A-Z])")
 
-def ingest_uploaded_text(file):
+# Tokens ending in "." that do not end a sentence
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "st", "jr", "sr", "vs", "etc",
+    "e.g", "i.e", "fig", "no", "inc", "ltd", "co", "u.s", "approx"
+}
+
+
+def _is_heading(line):
+    if len(line.split()) > 10 or line.endswith((".", ",", ";", ":")):
+        return False
+    if _HEADING_RE.match(line):
+        return True
+    # ALL CAPS needs some substance, single letters are list markers
+    return line.isupper() and sum(c.isalpha() for c in line) >= 4
+
+
+def _paragraphs(text):
+    """
+    Yields (paragraph, is_heading). A line is only a heading at the
+    start of a block (including a block of its own, as for DOCX
+    paragraphs and markdown titles) or after a line that ends a
+    sentence, so wrapped PDF lines starting with a number stay inside
+    their paragraph.
+    """
+    for block in _PARAGRAPH_RE.split(text):
+        lines = [l.strip() for l in block.splitlines() if l.strip()]
+        buf = []
+        for line in lines:
+            boundary = not buf or buf[-1].endswith((".", "!", "?", ":"))
+            if boundary and _is_heading(line):
+                if buf:
+                    yield " ".join(buf), False
+                    buf = []
+                yield line, True
+            else:
+                buf.append(line)
+        if buf:
+            yield " ".join(buf), False
+
+
+def split_paragraphs(text):
+    """
+    Splits text on blank lines. Heading lines (markdown, numbered
+    or ALL CAPS) become their own paragraph.
+    """
+    return [p for p, _ in _paragraphs(text)]
+
+
+def _ends_with_abbreviation(sentence):
+    word = sentence.rsplit(None, 1)[-1].lstrip("(\"'").lower()
+    if not word.endswith("."):
+        return False
+    word = word[:-1]
+    # Initials such as "J." count too
+    return word in _ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+
+def split_sentences(paragraph):
+    sentences = []
+    for piece in _SENTENCE_RE.split(paragraph):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if sentences and _ends_with_abbreviation(sentences[-1]):
+            sentences[-1] += " " + piece
+        else:
+            sentences.append(piece)
+    return sentences
+
+
+def _split_long(sentence, max_tokens):
+    """
+    Splits a single over-long sentence on word boundaries
+    """
+    pieces, buf, size = [], [], 0
+    for word in sentence.split():
+        n = count_tokens(word)
+        if buf and size + n > max_tokens:
+            pieces.append(" ".join(buf))
+            buf, size = [], 0
+        buf.append(word)
+        size += n
+    if buf:
+        pieces.append(" ".join(buf))
+    return pieces
+
+
+def _units(text, max_tokens):
+    """
+    Yields (sentence, token_count, starts_paragraph, is_heading)
+    never exceeding max_tokens
+    """
+    for paragraph, heading in _paragraphs(text):
+        first = True
+        for sentence in split_sentences(paragraph):
+            n = count_tokens(sentence)
+            parts = [sentence] if n <= max_tokens else _split_long(sentence, max_tokens)
+            for part in parts:
+                yield part, (n if len(parts) == 1 else count_tokens(part)), first, heading
+                first = False
+
+
+def _pack(units, max_tokens, overlap):
+    """
+    Groups units into lists of at most max_tokens tokens. A heading
+    always opens a new group (without overlap); otherwise the last
+    `overlap` units of a group are repeated at the start of the next.
+    """
+    groups = []
+    buf = []   # (sentence, tokens, starts_paragraph, is_heading)
+    size = 0
+
+    for unit in units:
+        _, n, _, heading = unit
+        # Consecutive headings (e.g. "2 Methods" / "2.1 Data") stay together
+        if heading and any(not u[3] for u in buf):
+            groups.append(buf)
+            buf, size = [], 0
+        elif buf and size + n > max_tokens:
+            groups.append(buf)
+            keep = buf[-overlap:] if overlap else []
+            # Drop the overlap if it would not leave room for the new sentence
+            while keep and sum(k[1] for k in keep) + n > max_tokens:
+                keep = keep[1:]
+            buf = keep
+            size = sum(k[1] for k in buf)
+        buf.append(unit)
+        size += n
+
+    if buf:
+        groups.append(buf)
+
+    return groups
+
+
+def _render(group):
+    out = ""
+    for i, (s, _, para, _) in enumerate(group):
+        out += ("\n" if para and i else " " if i else "") + s
+    return out
+
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS, overlap=OVERLAP_SENTENCES):
+    """
+    Packs whole sentences into chunks of at most max_tokens tokens.
+    Paragraph breaks are kept as newlines inside a chunk; the last
+    `overlap` sentences of a chunk are repeated at the start of the next.
+    A heading always opens a new chunk (without overlap).
+    """
+    return [_render(g) for g in _pack(_units(text, max_tokens), max_tokens, overlap)]
+
+
+def chunk_text_parent_child(text, child_tokens=CHILD_TOKENS, parent_tokens=PARENT_TOKENS):
+    """
+    Returns (child, parent) pairs: children are small chunks to embed,
+    parents are the larger surrounding chunk handed to the LLM.
+    Children are packed from the parent's own units, so they keep its
+    paragraph and heading boundaries.
+    """
+    pairs = []
+    units = _units(text, child_tokens)
+    for group in _pack(units, parent_tokens, overlap=0):
+        parent = _render(group)
+        for child in _pack(group, child_tokens, OVERLAP_SENTENCES):
+            pairs.append((_render(child), parent))
+    return pairs
+
+
+def ingest_uploaded_text(file, parent_child=False, embed_fn=embed_texts):
     text = ""
 
     if file.name.endswith(".txt"):
@@ -22,23 +191,29 @@ def ingest_uploaded_text(file):
 
     elif file.name.endswith(".pdf"):
         reader = PdfReader(file)
-        text = " ".join(p.extract_text() or "" for p in reader.pages)
+        text = "\n\n".join(p.extract_text() or "" for p in reader.pages)
 
     elif file.name.endswith(".docx"):
         doc = Document(file)
-        text = " ".join(p.text for p in doc.paragraphs)
+        text = "\n\n".join(p.text for p in doc.paragraphs)
 
-    chunks = chunk_text(text)
+    if parent_child:
+        pairs = chunk_text_parent_child(text)
+    else:
+        pairs = [(c, None) for c in chunk_text(text)]
 
-    embeddings, metadata = [], []
+    embeddings = embed_fn([chunk for chunk, _ in pairs])
+    metadata = []
 
-    for i, chunk in enumerate(chunks):
-        embeddings.append(embed_text(chunk))
-        metadata.append({
-            "content": chunk,
+    for i, (chunk, parent) in enumerate(pairs):
+        meta = {
+            "content": parent or chunk,
             "source": file.name,
             "chunk": i,
             "modality": "text"
-        })
+        }
+        if parent:
+            meta["embedded"] = chunk
+        metadata.append(meta)
 
     return embeddings, metadata
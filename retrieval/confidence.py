@@ -1,27 +1,114 @@
-def confidence_score(results, intent="qa"):
+import numpy as np
+
+# Cosine similarity calibration for MiniLM (normalized) embeddings
+WEAK_SIM = 0.25     # at or below: no real match
+STRONG_SIM = 0.65   # at or above: clear match
+GAP_SCALE = 0.15    # top-vs-median margin that counts as a clear winner
+CLOSE_DROP = 0.1    # hits within this of the top one count as support
+
+# Below this the LLM is skipped and "insufficient evidence" is returned
+MIN_CONFIDENCE = 0.2
+
+# Image-only evidence cannot be calibrated against a text query
+IMAGE_ONLY_CONFIDENCE = 0.35
+
+
+def is_text_space(meta):
+    """
+    Image hits hold raw CLIP features, not unit MiniLM vectors, so their
+    distance to a text query carries no calibrated meaning
+    """
+    return meta.get("modality") != "image"
+
+
+def similarities(results, vectors=None):
+    """
+    Converts FAISS squared L2 distances of unit vectors to cosine similarity.
+    Only meaningful for text-space hits (see is_text_space).
+    When the hit vectors are given, zero vectors (empty content) score -1:
+    they sit at distance 1 from any query and would otherwise read as 0.5.
+    """
+    d = np.array([r[1] for r in results], dtype="float32")
+    sims = np.clip(1.0 - d / 2.0, -1.0, 1.0)
+
+    if vectors is not None and len(vectors):
+        sims[np.linalg.norm(vectors, axis=1) < 1e-6] = -1.0
+
+    return sims
+
+
+def confidence_score(results, intent="qa", vectors=None, corpus_size=None, corpus_sources=None):
     """
     Returns confidence between 0 and 1
-    Intent-aware confidence scoring
+    Intent-aware, derived from the retrieval distances of text-space hits:
+    - strength:  how good the best match is
+    - support:   how many hits are nearly as good
+    - gap:       how clearly the top hits stand out from the rest
+    - agreement: whether close hits come from more than one modality
+      (text, audio, video, excel; images are not comparable)
+
+    Image hits are left out of the calibration. When only images were
+    retrieved the answer rests on their OCR text, so a fixed low
+    IMAGE_ONLY_CONFIDENCE is returned instead of failing the gate.
+
+    Summaries are scored on coverage: the share of the corpus' documents
+    and chunks the hits span. "Summarize the report" resembles no single
+    chunk, so its best similarity says nothing about the summary.
     """
 
     if not results:
         return 0.0
 
-    # Summarization confidence depends on document availability
     if intent == "summarization":
-        return 0.85
+        hit_sources = {r[0].get("source") for r in results}
+        if not corpus_size or not corpus_sources:
+            # No corpus stats: fall back to breadth of the hits alone
+            return round(0.5 + 0.4 * min(1.0, len(hit_sources) / 2), 2)
+        chunk_cov = min(1.0, len(results) / corpus_size)
+        source_cov = min(1.0, len(hit_sources) / corpus_sources)
+        return round(0.4 + 0.3 * source_cov + 0.3 * chunk_cov, 2)
 
-    # QA confidence depends on number of supporting chunks
-    n = len(results)
+    text = np.array([is_text_space(r[0]) for r in results])
+    if not text.any():
+        return IMAGE_ONLY_CONFIDENCE
 
-    if n >= 5:
-        return 0.9
-    elif n >= 3:
-        return 0.75
-    elif n == 2:
-        return 0.55
-    else:
-        return 0.35
+    results = [r for r, t in zip(results, text) if t]
+    if vectors is not None and len(vectors):
+        vectors = np.asarray(vectors)[text]
+
+    sims = similarities(results, vectors)
+    top = float(sims.max())
+
+    strength = np.clip((top - WEAK_SIM) / (STRONG_SIM - WEAK_SIM), 0.0, 1.0)
+
+    close = sims >= top - CLOSE_DROP
+    support = min(1.0, close.sum() / 3)
+    gap = np.clip((top - float(np.median(sims))) / GAP_SCALE, 0.0, 1.0)
+    modalities = {r[0].get("modality") for r, c in zip(results, close) if c}
+    agreement = 1.0 if len(modalities) > 1 else 0.0
+
+    quality = 0.6 + 0.2 * support + 0.1 * gap + 0.1 * agreement
+
+    return round(float(strength * quality), 2)
+
+
+def adaptive_top_k(results, min_k=1, max_drop=0.15, floor=WEAK_SIM, vectors=None):
+    """
+    Cuts text-space results (sorted best first) once the score drops
+    off: keeps hits within max_drop of the best one and above floor,
+    but always at least min_k. Image hits are not scored on this scale;
+    callers keep them separately (see retrieval.retriever.retrieve).
+    """
+
+    if not results:
+        return 0
+
+    sims = similarities(results, vectors)
+    keep = (sims >= sims[0] - max_drop) & (sims > floor)
+
+    # First hit that fails ends the list
+    k = int(np.argmin(keep)) if not keep.all() else len(results)
+    return max(k, min(min_k, len(results)))
 
 
 def uncertainty_message(confidence: float):
@@ -1,22 +1,138 @@
-def detect_conflicts(evidence):
+import threading
+import numpy as np
+from retrieval.coverage import document_coverage
+
+# Cosine thresholds on the stored embeddings
+DUPLICATE_SIM = 0.92   # same claim, restated
+TOPIC_SIM = 0.6        # same topic, possibly divergent claim
+
+# Optional NLI pass over the most similar divergent pairs
+NLI_MODEL = "cross-encoder/nli-deberta-v3-xsmall"
+NLI_LABELS = ["contradiction", "entailment", "neutral"]
+NLI_TOP_PAIRS = 8
+NLI_THRESHOLD = 0.5
+
+_nli = None
+_nli_lock = threading.Lock()
+
+
+def _load_nli():
+    global _nli
+    with _nli_lock:
+        if _nli is None:
+            from sentence_transformers import CrossEncoder
+            _nli = CrossEncoder(NLI_MODEL, max_length=256)
+    return _nli
+
+
+def contradiction_scores(pairs):
     """
-    Detect conflicting statements across retrieved chunks.
-    Simple but effective heuristic for hackathon.
+    Batched NLI: probability that each (premise, hypothesis) pair contradicts
     """
+    return _load_nli().predict(
+        pairs,
+        apply_softmax=True,
+        convert_to_numpy=True
+    )[:, NLI_LABELS.index("contradiction")]
 
-    if len(evidence) < 2:
-        return False, []
 
-    texts = [e["content"].lower() for e in evidence]
+def similarity_matrix(vectors):
+    """
+    Cosine similarity between every pair of rows, shape (n, n)
+    """
+    v = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(v, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    v = v / norms
+    return v @ v.T
+
+
+def _space(meta):
+    # Image vectors come from CLIP, everything else from MiniLM
+    return "image" if meta.get("modality") == "image" else "text"
 
-    conflicts = []
-    for i in range(len(texts)):
-        for j in range(i + 1, len(texts)):
-            # very simple contradiction heuristic
-            if (
-                "not" in texts[i] and "is" in texts[j]
-                or "false" in texts[i] and "true" in texts[j]
-            ):
-                conflicts.append((evidence[i], evidence[j]))
 
-    return len(conflicts) > 0, conflicts
+def analyze_evidence(
+    evidence,
+    vectors,
+    nli=False,
+    duplicate_sim=DUPLICATE_SIM,
+    topic_sim=TOPIC_SIM,
+    top_pairs=NLI_TOP_PAIRS,
+    nli_fn=contradiction_scores
+):
+    """
+    Consistency + coverage pass over retrieved evidence in one go.
+
+    Returns a dict with:
+    - unique:     indices of evidence left after dropping near-duplicates
+    - duplicates: (i, j, sim) pairs that restate the same claim
+    - divergent:  (i, j, sim) pairs on the same topic that are not duplicates
+    - conflicts:  (i, j, score) pairs confirmed as contradictions by NLI;
+                  always empty when nli=False (similarity alone cannot
+                  tell a contradiction from two chunks on one topic)
+    - coverage:   document_coverage over the unique evidence
+    """
+    n = len(evidence)
+    report = {
+        "unique": list(range(n)),
+        "duplicates": [],
+        "divergent": [],
+        "conflicts": [],
+        "coverage": document_coverage(evidence) if n else {}
+    }
+    if n < 2:
+        return report
+
+    sim = similarity_matrix(vectors)
+
+    # Only compare vectors from the same embedding space
+    spaces = np.array([_space(e) for e in evidence])
+    comparable = spaces[:, None] == spaces[None, :]
+
+    upper = np.triu(np.ones((n, n), dtype=bool), k=1) & comparable
+    dup = upper & (sim >= duplicate_sim)
+
+    # Keep the best-ranked copy of each duplicate group
+    keep = ~dup.any(axis=0)
+    unique = np.flatnonzero(keep)
+
+    div = upper & (sim >= topic_sim) & ~dup & keep[:, None] & keep[None, :]
+
+    di, dj = np.nonzero(dup)
+    vi, vj = np.nonzero(div)
+    order = np.argsort(-sim[vi, vj])
+    vi, vj = vi[order], vj[order]
+
+    report["unique"] = unique.tolist()
+    report["duplicates"] = [
+        (int(i), int(j), float(sim[i, j])) for i, j in zip(di, dj)
+    ]
+    report["divergent"] = [
+        (int(i), int(j), float(sim[i, j])) for i, j in zip(vi, vj)
+    ]
+    report["coverage"] = document_coverage([evidence[i] for i in unique])
+
+    candidates = report["divergent"][:top_pairs]
+    if nli and candidates:
+        # In parent-child mode content is a long parent; NLI (256 tokens)
+        # must see the passage that actually matched
+        text = [e.get("embedded", e["content"]) for e in evidence]
+        scores = nli_fn([(text[i], text[j]) for i, j, _ in candidates])
+        report["conflicts"] = [
+            (i, j, float(s))
+            for (i, j, _), s in zip(candidates, scores)
+            if s >= NLI_THRESHOLD
+        ]
+
+    return report
+
+
+def detect_conflicts(evidence, vectors, nli=True):
+    """
+    Detect conflicting statements across retrieved chunks: embeddings
+    pick the candidate pairs, NLI confirms them (see analyze_evidence)
+    """
+    conflicts = analyze_evidence(evidence, vectors, nli=nli)["conflicts"]
+    pairs = [(evidence[i], evidence[j]) for i, j, _ in conflicts]
+    return len(pairs) > 0, pairs
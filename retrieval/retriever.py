@@ -0,0 +1,39 @@
+import numpy as np
+from retrieval.confidence import confidence_score, adaptive_top_k, is_text_space
+
+MAX_K = 12
+MIN_K = 2
+
+
+def retrieve(store, query_embedding, intent="qa", max_k=MAX_K, min_k=MIN_K, adaptive=True):
+    """
+    Searches max_k candidates, scores confidence over all of them,
+    then keeps only the text-space hits before the score drop-off.
+    Image hits are never cut (their distances are not comparable).
+    Returns (results, vectors, confidence)
+    """
+
+    results, vectors = store.search_with_vectors(query_embedding, k=max_k)
+
+    # Zero vectors (empty content) rank above weak real hits, drop them
+    if len(vectors):
+        real = np.flatnonzero(np.linalg.norm(vectors, axis=1) >= 1e-6)
+        results, vectors = [results[i] for i in real], vectors[real]
+
+    conf = confidence_score(
+        results, intent, vectors,
+        corpus_size=store.index.ntotal,
+        corpus_sources=len(store.sources)
+    )
+
+    # Summaries want breadth, keep at least the fixed k
+    if adaptive and intent != "summarization" and results:
+        text = np.array([is_text_space(r[0]) for r in results])
+        text_idx = np.flatnonzero(text)
+        k = adaptive_top_k(
+            [results[i] for i in text_idx], min_k, vectors=vectors[text_idx]
+        )
+        keep = np.sort(np.concatenate([text_idx[:k], np.flatnonzero(~text)]))
+        results, vectors = [results[i] for i in keep], vectors[keep]
+
+    return results, vectors, conf
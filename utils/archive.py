@@ -0,0 +1,323 @@
+"""
+Compact archive of a user's corpus and conversations.
+
+Zip (stored, not deflated) containing:
+- manifest.json     format version, counts, vector dtype/dim, sha256 per file
+- metadata.parquet  one row per vector: content, source, modality, extra (JSON)
+- vectors.bin       raw little-endian float16/float32 matrix, row i <-> metadata row i
+- chats.parquet     chat, summary
+- messages.parquet  chat, turn, question, answer
+
+Everything is written and read in blocks of BLOCK_ROWS rows, and
+import rebuilds the FAISS index from the stored vectors (no re-embedding).
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from vectorstore.faiss_store import FAISSStore
+
+
+FORMAT_VERSION = 1
+BLOCK_ROWS = 4096
+READ_BYTES = 1 << 20
+
+CORE_FIELDS = ["content", "source", "modality"]
+
+METADATA_SCHEMA = pa.schema(
+    [(f, pa.string()) for f in CORE_FIELDS] + [("extra", pa.string())]
+)
+CHATS_SCHEMA = pa.schema([("chat", pa.string()), ("summary", pa.string())])
+MESSAGES_SCHEMA = pa.schema([
+    ("chat", pa.string()),
+    ("turn", pa.int32()),
+    ("question", pa.string()),
+    ("answer", pa.string())
+])
+
+
+# ===================== HELPERS =====================
+def _sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _blocks(items, size=BLOCK_ROWS):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _metadata_rows(metas):
+    rows = {f: [] for f in CORE_FIELDS}
+    rows["extra"] = []
+    for m in metas:
+        for f in CORE_FIELDS:
+            v = m.get(f)
+            rows[f].append(None if v is None else str(v))
+        extra = {k: v for k, v in m.items() if k not in CORE_FIELDS}
+        rows["extra"].append(json.dumps(extra, default=str) if extra else None)
+    return rows
+
+
+def _write_parquet(path, schema, row_blocks):
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in row_blocks:
+            writer.write_table(pa.table(rows, schema=schema))
+
+
+# ===================== EXPORT =====================
+def export_archive(out, store=None, chat_sessions=None, username=None, dtype="float16"):
+    """
+    Writes store and/or chat_sessions to out (path or binary file object).
+    dtype is the on-disk vector precision: "float16" or "float32".
+    Returns the manifest dict.
+    """
+
+    if dtype not in ("float16", "float32"):
+        raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+    tmp_dir = tempfile.mkdtemp()
+    files = {}
+
+    try:
+        count, dim = 0, None
+
+        if store is not None:
+            count, dim = store.index.ntotal, store.dim
+
+            path = os.path.join(tmp_dir, "metadata.parquet")
+            _write_parquet(
+                path, METADATA_SCHEMA,
+                (_metadata_rows(b) for b in _blocks(store.metadata[:count]))
+            )
+            files["metadata.parquet"] = path
+
+            path = os.path.join(tmp_dir, "vectors.bin")
+            with open(path, "wb") as f:
+                for start in range(0, count, BLOCK_ROWS):
+                    n = min(BLOCK_ROWS, count - start)
+                    block = store.index.reconstruct_n(start, n)
+                    f.write(block.astype(np.dtype(dtype).newbyteorder("<")).tobytes())
+            files["vectors.bin"] = path
+
+        if chat_sessions is not None:
+            names = list(chat_sessions)
+
+            path = os.path.join(tmp_dir, "chats.parquet")
+            _write_parquet(path, CHATS_SCHEMA, [{
+                "chat": names,
+                "summary": [chat_sessions[c]["summary"] for c in names]
+            }])
+            files["chats.parquet"] = path
+
+            def message_rows():
+                rows = {"chat": [], "turn": [], "question": [], "answer": []}
+                for c in names:
+                    for turn, (q, a) in enumerate(chat_sessions[c]["messages"]):
+                        rows["chat"].append(c)
+                        rows["turn"].append(turn)
+                        rows["question"].append(q)
+                        rows["answer"].append(a)
+                        if len(rows["chat"]) >= BLOCK_ROWS:
+                            yield rows
+                            rows = {k: [] for k in rows}
+                yield rows
+
+            path = os.path.join(tmp_dir, "messages.parquet")
+            _write_parquet(path, MESSAGES_SCHEMA, message_rows())
+            files["messages.parquet"] = path
+
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "created": int(time.time()),
+            "username": username,
+            "vectors": {"count": count, "dim": dim, "dtype": dtype},
+            "files": {name: _sha256_file(p) for name, p in files.items()}
+        }
+
+        with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+            zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+            for name, path in files.items():
+                zf.write(path, name)
+
+        return manifest
+
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# ===================== IMPORT =====================
+def _verify(zf, name, expected):
+    h = hashlib.sha256()
+    try:
+        with zf.open(name) as f:
+            for block in iter(lambda: f.read(READ_BYTES), b""):
+                h.update(block)
+    except (KeyError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Corrupt or missing archive member {name}: {e}")
+    if h.hexdigest() != expected:
+        raise ValueError(f"Checksum mismatch for {name}")
+
+
+def _read_parquet(zf, name):
+    with zf.open(name) as f:
+        for batch in pq.ParquetFile(f).iter_batches(batch_size=BLOCK_ROWS):
+            yield batch.to_pydict()
+
+
+def _read_metadata(zf):
+    for rows in _read_parquet(zf, "metadata.parquet"):
+        for i in range(len(rows["extra"])):
+            meta = {f: rows[f][i] for f in CORE_FIELDS if rows[f][i] is not None}
+            if rows["extra"][i]:
+                meta.update(json.loads(rows["extra"][i]))
+            yield meta
+
+
+VECTOR_DTYPES = ("float16", "float32")
+
+# Files that must appear together in an archive
+FILE_GROUPS = [
+    ("metadata.parquet", "vectors.bin"),
+    ("chats.parquet", "messages.parquet")
+]
+
+
+def _validate_manifest(manifest, dim):
+    """
+    Checks the manifest structure before anything is read,
+    raising ValueError for anything export_archive would not write
+    """
+
+    if not isinstance(manifest, dict):
+        raise ValueError("Manifest is not a JSON object")
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported archive version: {manifest.get('format_version')}"
+        )
+
+    files = manifest.get("files")
+    if not isinstance(files, dict) or not all(
+        isinstance(d, str) for d in files.values()
+    ):
+        raise ValueError("Manifest 'files' must map file names to checksums")
+
+    known = {name for group in FILE_GROUPS for name in group}
+    unknown = set(files) - known
+    if unknown:
+        raise ValueError(f"Unknown archive members: {sorted(unknown)}")
+
+    for group in FILE_GROUPS:
+        present = [name for name in group if name in files]
+        if present and len(present) != len(group):
+            raise ValueError(f"Archive must contain all of {list(group)}")
+
+    if "vectors.bin" in files:
+        info = manifest.get("vectors")
+        if not isinstance(info, dict):
+            raise ValueError("Manifest 'vectors' section is missing")
+
+        count = info.get("count")
+        if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+            raise ValueError(f"Invalid vector count: {count!r}")
+
+        if info.get("dim") != dim:
+            raise ValueError(
+                f"Archive vectors are {info.get('dim')}-dim, expected {dim}"
+            )
+
+        if info.get("dtype") not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {info.get('dtype')!r}")
+
+
+def _load_store(zf, info):
+    count, dim = info["count"], info["dim"]
+    dtype = np.dtype(info["dtype"]).newbyteorder("<")
+    row_bytes = dim * dtype.itemsize
+
+    store = FAISSStore(dim)
+    metas = _read_metadata(zf)
+
+    with zf.open("vectors.bin") as f:
+        added = 0
+        while added < count:
+            n = min(BLOCK_ROWS, count - added)
+            buf = f.read(n * row_bytes)
+            if len(buf) != n * row_bytes:
+                raise ValueError("vectors.bin is truncated")
+            block = np.frombuffer(buf, dtype=dtype).reshape(n, dim)
+            block_metas = list(itertools.islice(metas, n))
+            if len(block_metas) != n:
+                raise ValueError("metadata.parquet has fewer rows than vectors")
+            store.add_vectors(block.astype("float32"), block_metas)
+            added += n
+
+        if f.read(1):
+            raise ValueError("vectors.bin has more rows than the manifest")
+
+    if next(metas, None) is not None:
+        raise ValueError("metadata.parquet has more rows than vectors")
+
+    return store
+
+
+def _load_chats(zf):
+    chat_sessions = {}
+    for rows in _read_parquet(zf, "chats.parquet"):
+        for c, summary in zip(rows["chat"], rows["summary"]):
+            chat_sessions[c] = {"messages": [], "summary": summary or ""}
+
+    for rows in _read_parquet(zf, "messages.parquet"):
+        # Rows are written in turn order per chat
+        for c, q, a in zip(rows["chat"], rows["question"], rows["answer"]):
+            if c not in chat_sessions:
+                raise ValueError(f"messages.parquet refers to unknown chat {c!r}")
+            chat_sessions[c]["messages"].append((q, a))
+
+    return chat_sessions
+
+
+def import_archive(src, dim=384):
+    """
+    Reads an archive written by export_archive from src (path or binary
+    file object). Verifies the manifest and every checksum, then rebuilds
+    the index from the stored vectors, which must be dim-dimensional.
+    Returns (store or None, chat_sessions or None, manifest)
+    Any malformed archive raises ValueError.
+    """
+
+    try:
+        zf = zipfile.ZipFile(src)
+        manifest = json.loads(zf.read("manifest.json"))
+    except (KeyError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Not a workspace archive: {e}")
+
+    with zf:
+        _validate_manifest(manifest, dim)
+
+        files = manifest["files"]
+        for name, digest in files.items():
+            _verify(zf, name, digest)
+
+        try:
+            store = _load_store(zf, manifest["vectors"]) if "vectors.bin" in files else None
+            chat_sessions = _load_chats(zf) if "chats.parquet" in files else None
+        except (KeyError, TypeError, pa.ArrowException) as e:
+            # Checksums match but the tables do not have the expected layout
+            raise ValueError(f"Malformed archive contents: {e!r}")
+
+    return store, chat_sessions, manifest
@@ -13,3 +13,10 @@ def generate_report(query, answer, evidence, confidence):
         )
 
     return "\n".join(report)
+
+
+def chat_to_text(chat):
+    lines = [f"Summary:\n{chat['summary']}\n"]
+    for q, a in chat["messages"]:
+        lines.append(f"Q: {q}\nA: {a}\n")
+    return "\n".join(lines)
@@ -1,3 +1,4 @@
+import threading
 import faiss
 import numpy as np
 
@@ -7,6 +8,10 @@ class FAISSStore:
         self.dim = dim
         self.index = faiss.IndexFlatL2(dim)
         self.metadata = []
+        # Distinct documents indexed, for coverage-based scoring
+        self.sources = set()
+        # Guards index/metadata when sessions of the same user overlap
+        self._lock = threading.RLock()
 
     def _fix_embedding(self, emb):
         """
@@ -58,23 +63,75 @@ class FAISSStore:
 
         vectors = np.vstack(fixed_vectors).astype("float32")
 
-        self.index.add(vectors)
-        self.metadata.extend(metadatas)
+        # Zero vectors come from empty content and match every query
+        nonzero = np.flatnonzero(np.linalg.norm(vectors, axis=1) >= 1e-6)
+        if len(nonzero) < len(vectors):
+            vectors = vectors[nonzero]
+            metadatas = [metadatas[i] for i in nonzero]
+            if not len(vectors):
+                return
 
-    def search(self, query_embedding, k=5):
-        if self.index.ntotal == 0 or not self.metadata:
-            return []
+        with self._lock:
+            self.index.add(vectors)
+            self.metadata.extend(metadatas)
+            self.sources.update(m.get("source") for m in metadatas)
+
+    def add_vectors(self, vectors, metadatas):
+        """
+        Adds an already shaped (n, dim) array, skipping per-row fixing
+        """
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
 
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected (n, {self.dim}) vectors, got {vectors.shape}")
+
+        if len(vectors) != len(metadatas):
+            raise ValueError("Embeddings and metadata length mismatch")
+
+        with self._lock:
+            self.index.add(vectors)
+            self.metadata.extend(metadatas)
+            self.sources.update(m.get("source") for m in metadatas)
+
+    def _search_ids(self, query_embedding, k):
         q = self._fix_embedding(query_embedding).reshape(1, -1)
 
-        D, I = self.index.search(q, k)
+        with self._lock:
+            D, I = self.index.search(q, k)
 
-        results = []
+        hits = []
         for rank, meta_idx in enumerate(I[0]):
             if meta_idx == -1:
                 continue
             if meta_idx < 0 or meta_idx >= len(self.metadata):
                 continue
-            results.append((self.metadata[meta_idx], float(D[0][rank])))
+            hits.append((int(meta_idx), float(D[0][rank])))
+
+        return hits
+
+    def search(self, query_embedding, k=5):
+        if self.index.ntotal == 0 or not self.metadata:
+            return []
+
+        return [
+            (self.metadata[i], dist)
+            for i, dist in self._search_ids(query_embedding, k)
+        ]
+
+    def search_with_vectors(self, query_embedding, k=5):
+        """
+        Same as search, but also returns the stored vectors of the hits
+        as a (n, dim) float32 array (row i belongs to results[i])
+        """
+        if self.index.ntotal == 0 or not self.metadata:
+            return [], np.zeros((0, self.dim), dtype="float32")
+
+        hits = self._search_ids(query_embedding, k)
+
+        with self._lock:
+            vectors = np.vstack(
+                [self.index.reconstruct(i) for i, _ in hits]
+            ) if hits else np.zeros((0, self.dim), dtype="float32")
 
-        return results
+        results = [(self.metadata[i], dist) for i, dist in hits]
+        return results, vectors.astype("float32")
@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import OrderedDict
+from vectorstore.faiss_store import FAISSStore
+
+# One store per authenticated user, shared by all of that user's sessions.
+# Stores live in process memory: they are released on logout, after
+# STORE_TTL seconds without use, or least-recently-used first beyond
+# MAX_STORES users (Export Workspace keeps a copy across evictions).
+STORE_TTL = 2 * 60 * 60
+MAX_STORES = 50
+
+_stores = OrderedDict()   # username -> (store, last_used), oldest first
+_lock = threading.Lock()
+
+
+def _evict(now):
+    while _stores:
+        username, (_, last_used) = next(iter(_stores.items()))
+        if len(_stores) <= MAX_STORES and now - last_used < STORE_TTL:
+            break
+        del _stores[username]
+
+
+def _put(username, store):
+    now = time.monotonic()
+    _stores[username] = (store, now)
+    _stores.move_to_end(username)
+    _evict(now)
+    return store
+
+
+def get_user_store(username, dim=384):
+    """
+    Returns the store owned by username, creating an empty one if needed
+    """
+    with _lock:
+        store = _stores[username][0] if username in _stores else FAISSStore(dim)
+        return _put(username, store)
+
+
+def reset_user_store(username, dim=384):
+    """
+    Replaces username's store with an empty one and returns it
+    """
+    with _lock:
+        return _put(username, FAISSStore(dim))
+
+
+def set_user_store(username, store):
+    """
+    Installs a prebuilt store (e.g. an imported archive) for username
+    """
+    with _lock:
+        return _put(username, store)
+
+
+def drop_user_store(username):
+    with _lock:
+        _stores.pop(username, None)